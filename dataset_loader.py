@@ -1,5 +1,6 @@
 import random
 import os
+import numpy as np
 
 class SimpleDatasetLoader:
     def __init__(self):
@@ -16,17 +17,18 @@ class SimpleDatasetLoader:
     def load_audio_samples(self, max_samples=100):
         """Load simulated audio samples"""
         print(f"Generating {max_samples} simulated CAPTCHA samples...")
-        
-        # Create simulated data
-        self.audio_files = []
-        self.text_labels = []
-        
-        for i in range(max_samples):
-            # Generate random sequences
-            sequence = ''.join(random.choices('0123456789', k=random.randint(3, 6)))
-            self.audio_files.append(f"/simulated/audio/audio_{i:03d}.wav")
-            self.text_labels.append(sequence)
-        
+
+        # Draw all lengths and digits with two vectorized RNG calls, then
+        # slice each label out of one ASCII byte buffer instead of joining
+        # random.choices() per sample in a Python loop
+        rng = np.random.default_rng()
+        lens = rng.integers(3, 7, size=max_samples)
+        digits = (rng.integers(0, 10, size=(max_samples, 6)) + ord('0')).astype(np.uint8)
+        buf = digits.tobytes()
+
+        self.text_labels = [buf[i * 6:i * 6 + lens[i]].decode('ascii') for i in range(max_samples)]
+        self.audio_files = [f"/simulated/audio/audio_{i:03d}.wav" for i in range(max_samples)]
+
         print(f"Generated {len(self.audio_files)} simulated samples")
         return list(zip(self.audio_files, self.text_labels))
     
@@ -1,110 +1,163 @@
 # model_trainer.py
+import os
 import tensorflow as tf
 from tensorflow import keras
+from tensorflow.keras import mixed_precision
 import numpy as np
 import librosa
 from sklearn.model_selection import train_test_split
 from dataset_loader import dataset_loader
 
+# Half-precision compute halves memory traffic and enables tensor cores on
+# supporting GPUs; the softmax output stays float32 for a stable loss
+mixed_precision.set_global_policy('mixed_float16')
+
+# On-disk feature cache: MFCCs are computed once, stored as float16 and
+# memory-mapped on later runs so the OS page cache serves them for free
+FEATURE_CACHE = 'mfcc_cache.npy'
+LABEL_CACHE = 'mfcc_labels.npy'
+
 class CaptchaModelTrainer:
     def __init__(self):
         self.model = None
         self.characters = '0123456789abcdefghijklmnopqrstuvwxyz'
+        # O(1) hash lookups instead of str.index scans when encoding labels
+        self._char_to_idx = {c: i for i, c in enumerate(self.characters)}
         self.max_length = 10
         
     def preprocess_audio_batch(self, audio_files, labels):
         """Preprocess batch of audio files for training"""
-        processed_audio = []
+        # Collect raw audio into one preallocated matrix so MFCC extraction
+        # runs as a single batched librosa call instead of one FFT setup,
+        # pad and append per file
+        audio_matrix = np.empty((len(audio_files), 16000), dtype=np.float32)
         processed_labels = []
-        
+        n = 0
+
         for audio_file, label in zip(audio_files, labels):
             try:
-                # Preprocess audio
                 audio, sr = dataset_loader.preprocess_audio(audio_file)
-                if audio is not None:
-                    # Extract MFCC features
-                    mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-                    
-                    # Pad or truncate to consistent size
-                    if mfccs.shape[1] < 100:
-                        mfccs = np.pad(mfccs, ((0, 0), (0, 100 - mfccs.shape[1])))
-                    else:
-                        mfccs = mfccs[:, :100]
-                    
-                    processed_audio.append(mfccs)
-                    processed_labels.append(label)
-                    
+                if audio is None:
+                    continue
+                audio = audio[:16000]
+                audio_matrix[n, :len(audio)] = audio
+                audio_matrix[n, len(audio):] = 0.0
+                processed_labels.append(label)
+                n += 1
             except Exception as e:
                 print(f"Error processing {audio_file}: {e}")
                 continue
-        
-        return np.array(processed_audio), processed_labels
+
+        if n == 0:
+            return np.empty((0, 13, 100), dtype=np.float32), processed_labels
+
+        # One MFCC call over the whole batch (librosa broadcasts over
+        # leading axes), then one pad/truncate for every sample at once
+        mfccs = librosa.feature.mfcc(y=audio_matrix[:n], sr=16000, n_mfcc=13)
+        frames = mfccs.shape[-1]
+        if frames < 100:
+            mfccs = np.pad(mfccs, ((0, 0), (0, 0), (0, 100 - frames)))
+        else:
+            mfccs = mfccs[..., :100]
+
+        X = np.empty((n, 13, 100), dtype=np.float32)
+        X[:] = mfccs
+        return X, processed_labels
+
+    def build_feature_cache(self, audio_files, labels,
+                            feature_path=FEATURE_CACHE, label_path=LABEL_CACHE):
+        """Compute MFCC features for all files once and persist them to disk.
+
+        Features are stored as float16 (half the bytes to read back) and the
+        surviving labels alongside them, so later runs can memory-map the
+        cache instead of re-extracting.
+        """
+        X, kept_labels = self.preprocess_audio_batch(audio_files, labels)
+        np.save(feature_path, X.astype(np.float16))
+        np.save(label_path, np.array(kept_labels))
+        print(f"Cached {len(X)} feature vectors to {feature_path}")
+        return feature_path
     
     def build_model(self, input_shape):
         """Build CNN model for CAPTCHA recognition"""
+        # Conv -> BN -> ReLU ordering lets the BN fold into the conv weights
+        # at inference, and depthwise-separable convs cut the MAC count of
+        # the wider blocks ~9x for the same receptive field
         model = keras.Sequential([
             # First Conv Block
-            keras.layers.Conv2D(32, (3, 3), activation='relu', input_shape=input_shape),
-            keras.layers.MaxPooling2D((2, 2)),
+            keras.layers.Conv2D(32, (3, 3), padding='same', use_bias=False, input_shape=input_shape),
             keras.layers.BatchNormalization(),
-            
-            # Second Conv Block
-            keras.layers.Conv2D(64, (3, 3), activation='relu'),
+            keras.layers.ReLU(),
             keras.layers.MaxPooling2D((2, 2)),
+
+            # Second Conv Block
+            keras.layers.SeparableConv2D(64, (3, 3), padding='same', use_bias=False),
             keras.layers.BatchNormalization(),
-            
-            # Third Conv Block
-            keras.layers.Conv2D(128, (3, 3), activation='relu'),
+            keras.layers.ReLU(),
             keras.layers.MaxPooling2D((2, 2)),
+
+            # Third Conv Block
+            keras.layers.SeparableConv2D(128, (3, 3), padding='same', use_bias=False),
             keras.layers.BatchNormalization(),
-            
+            keras.layers.ReLU(),
+            keras.layers.MaxPooling2D((2, 2)),
+
             # Global pooling and dense layers
             keras.layers.GlobalAveragePooling2D(),
             keras.layers.Dense(256, activation='relu'),
             keras.layers.Dropout(0.5),
             keras.layers.Dense(128, activation='relu'),
             keras.layers.Dropout(0.3),
-            keras.layers.Dense(len(self.characters), activation='softmax')
+            keras.layers.Dense(len(self.characters)),
+            keras.layers.Activation('softmax', dtype='float32')
         ])
         
         model.compile(
             optimizer='adam',
             loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
+            metrics=['accuracy'],
+            jit_compile=True  # XLA fuses Conv+BN+ReLU into single kernels
         )
         
         return model
     
     def train_model(self, epochs=50):
         """Train the model on the CAPTCHA dataset"""
-        print("Loading dataset for training...")
-        dataset_loader.download_dataset()
-        samples = dataset_loader.load_audio_samples(1000)
-        
-        if not samples:
-            print("No samples found for training")
-            return False
-        
-        audio_files, labels = zip(*samples)
-        
-        print("Preprocessing audio data...")
-        X, y = self.preprocess_audio_batch(audio_files, labels)
-        
+        if not (os.path.exists(FEATURE_CACHE) and os.path.exists(LABEL_CACHE)):
+            print("Loading dataset for training...")
+            dataset_loader.download_dataset()
+            samples = dataset_loader.load_audio_samples(1000)
+
+            if not samples:
+                print("No samples found for training")
+                return False
+
+            audio_files, labels = zip(*samples)
+
+            print("Preprocessing audio data...")
+            self.build_feature_cache(audio_files, labels)
+
+        # Memory-map the cached features - repeat runs skip extraction
+        # entirely and read pages on demand from the OS cache
+        X = np.load(FEATURE_CACHE, mmap_mode='r')
+        y = np.load(LABEL_CACHE)
+
         if len(X) == 0:
             print("No valid training data after preprocessing")
             return False
-        
+
         # Reshape for CNN (add channel dimension)
         X = X[..., np.newaxis]
         
-        # Convert labels to numerical format
-        y_numeric = [self.characters.index(char) for label in y for char in label[:1]]  # First char only for simplicity
-        
+        # Convert labels to numerical format - first char only for simplicity
+        y_numeric = np.fromiter((self._char_to_idx[label[0]] for label in y),
+                                dtype=np.int32, count=len(y))
+
         # For now, using first character classification (simplified)
         # In production, you'd want sequence-to-sequence model
-        
+
         X_train, X_test, y_train, y_test = train_test_split(
-            X, y_numeric[:len(X)], test_size=0.2, random_state=42
+            X, y_numeric, test_size=0.2, random_state=42
         )
         
         print(f"Training on {len(X_train)} samples, testing on {len(X_test)} samples")
@@ -112,20 +165,30 @@ class CaptchaModelTrainer:
         # Build and train model
         self.model = self.build_model(X_train[0].shape)
         
+        # tf.data pipeline: cache keeps the arrays resident after epoch 1
+        # and prefetch overlaps host input with the training step
+        train_ds = (tf.data.Dataset.from_tensor_slices((X_train, y_train))
+                    .cache()
+                    .shuffle(1024)
+                    .batch(64)
+                    .prefetch(tf.data.AUTOTUNE))
+        val_ds = (tf.data.Dataset.from_tensor_slices((X_test, y_test))
+                  .batch(64)
+                  .prefetch(tf.data.AUTOTUNE))
+
         print("Starting model training...")
         history = self.model.fit(
-            X_train, y_train,
-            validation_data=(X_test, y_test),
+            train_ds,
+            validation_data=val_ds,
             epochs=epochs,
-            batch_size=32,
             callbacks=[
                 keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True),
                 keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=3)
             ]
         )
-        
+
         # Evaluate model
-        test_loss, test_accuracy = self.model.evaluate(X_test, y_test)
+        test_loss, test_accuracy = self.model.evaluate(val_ds)
         print(f"Test Accuracy: {test_accuracy:.4f}")
         
         # Save model